@@ -23,18 +23,23 @@ Usage: python ANPR_GUI_Complete.py
 # Import required libraries
 import sys
 import os
+import csv
 import cv2
 import numpy as np
+import psutil
+import random
 import time
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
-from camera_thread import CameraThread
+from camera_thread import CameraThread, bgr_to_qimage, DEFAULT_WIDTH, DEFAULT_HEIGHT
 from PyQt5.QtWidgets import QHeaderView
 from PyQt5 import QtCore
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # ===== STYLESHEET =====
 # Define the dark theme stylesheet for the application
@@ -185,12 +190,18 @@ QHeaderView::section {
 }
 """
 
+# ===== PLATE ALPHABETS =====
+# Fixed alphabets for the simulated plate generator (no I/O to avoid confusion)
+PLATE_LETTERS = 'ABCDEFGHJKLMNPQRSTUVWXYZ'
+PLATE_DIGITS = '0123456789'
+
 # ===== ANPR PROCESSOR CLASS =====
 class ANPRProcessor(QObject):
     """ANPR Processing Engine: Handles frame processing, ROI, and simulated plate detection."""
     
     processed_frame = pyqtSignal(QImage)
     plate_result = pyqtSignal(dict)
+    error_occurred = pyqtSignal(str)
     
     def __init__(self):
         super().__init__()
@@ -199,6 +210,15 @@ class ANPRProcessor(QObject):
         self.enable_ocr_correction = True
         self.country_template = "EU"
         self.roi = None
+        self._roi_mask = None
+        self._last_bad_frame_log = 0.0
+        self._last_error_log = 0.0
+        # When detection only needs luma, emit 1-byte-per-pixel frames
+        self.grayscale_mode = False
+        self._gray_buf = None
+        # Optional preview downscale factor (e.g. 0.5); None emits full size
+        self.preview_scale = None
+        self._preview_buf = None
 
     def start_stream(self, source):
         """Start ANPR processing stream from the given camera source."""
@@ -227,31 +247,103 @@ class ANPRProcessor(QObject):
         """Set the region of interest (ROI) for detection as a polygon."""
         if len(points) >= 4:
             self.roi = np.array(points, dtype=np.int32)
+            # Rasterise the polygon once at the capture resolution; filtering
+            # a candidate then costs a single mask lookup per frame instead of
+            # re-running a point-in-polygon test
+            camera_thread = self.camera_thread
+            if camera_thread is not None:
+                mask_height, mask_width = camera_thread.height, camera_thread.width
+            else:
+                mask_height, mask_width = DEFAULT_HEIGHT, DEFAULT_WIDTH
+            self._roi_mask = np.zeros((mask_height, mask_width), dtype=np.uint8)
+            cv2.fillPoly(self._roi_mask, [self.roi], 255)
+
+    def point_in_roi(self, x, y):
+        """Return True if (x, y) lies inside the configured ROI (or no ROI is set)."""
+        if self._roi_mask is None:
+            return True
+        h, w = self._roi_mask.shape
+        return 0 <= y < h and 0 <= x < w and bool(self._roi_mask[y, x])
 
     def process_frame(self, frame):
         """Process each frame for license plate detection (simulated)."""
         try:
+            # Malformed frames can arrive transiently while the camera
+            # reconfigures; skip them instead of raising 30 times a second
+            if frame is None or frame.ndim != 3:
+                self._log_bad_frame()
+                return
             # Only show the raw camera feed, no detection or overlays
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_frame.shape
-            qt_image = QImage(rgb_frame.data.tobytes(), w, h, w * ch, QImage.Format_RGB888)
-            self.processed_frame.emit(qt_image)
+            if self.preview_scale:
+                frame = self._downscale_preview(frame)
+            if self.grayscale_mode:
+                self.processed_frame.emit(self._gray_qimage(frame))
+            else:
+                self.processed_frame.emit(bgr_to_qimage(frame))
         except Exception as e:
-            logger.error(f"Error processing frame: {str(e)}")
+            # An exception escaping a queued slot aborts the app under
+            # PyQt5; surface unexpected failures like camera errors instead
+            self._report_frame_error(str(e))
+        finally:
+            # Tell the capture thread we can take another frame; bind to a
+            # local because stop_stream() clears the attribute from the GUI
+            # thread while queued frames are still in flight
+            camera_thread = self.camera_thread
+            if camera_thread is not None:
+                camera_thread.notify_consumer_ready()
+
+    def _downscale_preview(self, frame):
+        """Downscale a frame for preview emission using a reused buffer."""
+        h, w = frame.shape[:2]
+        size = (int(w * self.preview_scale), int(h * self.preview_scale))
+        if self._preview_buf is None or self._preview_buf.shape[:2] != (size[1], size[0]):
+            self._preview_buf = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        # INTER_AREA downsamples cleanly in a single pass; everything after
+        # this point (QImage construction, display scaling) touches a
+        # fraction of the pixels
+        cv2.resize(frame, size, dst=self._preview_buf, interpolation=cv2.INTER_AREA)
+        return self._preview_buf
+
+    def _gray_qimage(self, frame):
+        """Convert a BGR frame to a grayscale QImage via a reused buffer."""
+        h, w = frame.shape[:2]
+        if self._gray_buf is None or self._gray_buf.shape != (h, w):
+            self._gray_buf = np.empty((h, w), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+        # copy() detaches from the reused buffer before the next frame
+        return QImage(self._gray_buf.data, w, h, self._gray_buf.strides[0],
+                      QImage.Format_Grayscale8).copy()
+
+    def _log_bad_frame(self):
+        """Log malformed frames at most once per second to avoid log bursts."""
+        now = time.monotonic()
+        if now - self._last_bad_frame_log >= 1.0:
+            self._last_bad_frame_log = now
+            logger.error("Dropping malformed frame from camera")
+
+    def _report_frame_error(self, message):
+        """Log and signal a frame-processing error, at most once per second."""
+        now = time.monotonic()
+        if now - self._last_error_log >= 1.0:
+            self._last_error_log = now
+            logger.error(f"Error processing frame: {message}")
+            self.error_occurred.emit(f"Error processing frame: {message}")
     
     def generate_random_plate(self):
         """Generate a random license plate for simulation purposes."""
+        # random.choices runs in C and avoids numpy's per-call array setup,
+        # which dominates when sampling only a handful of characters
         if self.country_template == "EU":
-            letters = ''.join(np.random.choice(list('ABCDEFGHJKLMNPQRSTUVWXYZ'), 3))
-            numbers = ''.join(np.random.choice(list('0123456789'), 3))
+            letters = ''.join(random.choices(PLATE_LETTERS, k=3))
+            numbers = ''.join(random.choices(PLATE_DIGITS, k=3))
             return f"{letters}-{numbers}"
         elif self.country_template == "US":
-            letters = ''.join(np.random.choice(list('ABCDEFGHJKLMNPQRSTUVWXYZ'), 3))
-            numbers = ''.join(np.random.choice(list('0123456789'), 4))
+            letters = ''.join(random.choices(PLATE_LETTERS, k=3))
+            numbers = ''.join(random.choices(PLATE_DIGITS, k=4))
             return f"{numbers}{letters}"
         else:
-            letters = ''.join(np.random.choice(list('ABCDEFGHJKLMNPQRSTUVWXYZ'), 2))
-            numbers = ''.join(np.random.choice(list('0123456789'), 4))
+            letters = ''.join(random.choices(PLATE_LETTERS, k=2))
+            numbers = ''.join(random.choices(PLATE_DIGITS, k=4))
             return f"{letters}{numbers}"
     
     def handle_error(self, error_msg):
@@ -272,6 +364,9 @@ class ANPRMainWindow(QMainWindow):
         self.roi_drawing_mode = False
         self.roi_points = []
         self.available_cameras = []  # Store available camera indices
+        self._plate_set = set()  # Mirrors plate_list for O(1) lookups
+        self._disk_percent = 0.0  # Cached disk usage, refreshed once a minute
+        self._disk_checked = 0.0
         self.setup_ui()
         self.setup_menu_bar()
         self.setup_status_bar()
@@ -281,6 +376,13 @@ class ANPRMainWindow(QMainWindow):
         self.monitor_timer = QTimer()
         self.monitor_timer.timeout.connect(self.update_system_monitor)
         self.monitor_timer.start(2000)
+        # Detection rows are queued and flushed in batches so a burst of
+        # results costs one repaint instead of one per row
+        self._pending_results = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(100)
+        self._flush_timer.timeout.connect(self._flush_results)
     
     def setup_ui(self):
         """Setup the main user interface layout and panels."""
@@ -381,9 +483,10 @@ class ANPRMainWindow(QMainWindow):
     
     def setup_right_panel(self):
         """Setup the right display panel with camera feed, results, and vehicle details."""
-        # Remove any existing layout to avoid layout warnings
-        if self.right_panel.layout() is not None:
-            QWidget().setLayout(self.right_panel.layout())
+        # This runs exactly once from setup_ui; the panel must not have a
+        # layout yet (the old throwaway-QWidget reparenting hack leaked a
+        # dangling child into Qt's object tree)
+        assert self.right_panel.layout() is None, "setup_right_panel called twice"
         right_main_layout = QVBoxLayout()
         right_main_layout.setSpacing(10)
         right_main_layout.setContentsMargins(0, 0, 0, 0)
@@ -453,15 +556,28 @@ class ANPRMainWindow(QMainWindow):
         self.roi_button.clicked.connect(self.toggle_roi_mode)
         self.search_button.clicked.connect(self.search_vehicle)
         self.search_input.returnPressed.connect(self.search_vehicle)
+        # Debounce live filtering so fast typing runs the search once, not
+        # once per keystroke
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.search_vehicle)
+        self.search_input.textChanged.connect(lambda _text: self._search_timer.start())
         self.export_button.clicked.connect(self.export_results)
         self.camera_combo.currentTextChanged.connect(self.on_camera_source_changed)
-        self.refresh_camera_btn.clicked.connect(self.scan_and_update_cameras)
+        self.refresh_camera_btn.clicked.connect(self.refresh_cameras)
     
     def init_backend(self):
         """Initialize the ANPR backend and connect signals."""
         self.anpr_processor = ANPRProcessor()
+        # Run frame conversion on its own thread so it never competes with
+        # repaints; cross-thread signal connections are queued automatically
+        self.processor_thread = QThread()
+        self.anpr_processor.moveToThread(self.processor_thread)
+        self.processor_thread.start()
         self.anpr_processor.processed_frame.connect(self.update_frame)
         self.anpr_processor.plate_result.connect(self.add_detection_result)
+        self.anpr_processor.error_occurred.connect(self.show_camera_error)
         self.anpr_processor.handle_error = self.show_camera_error  # Override error handler
         if hasattr(self.anpr_processor, 'camera_thread') and self.anpr_processor.camera_thread:
             self.anpr_processor.camera_thread.error_occurred.connect(self.show_camera_error)
@@ -515,51 +631,72 @@ class ANPRMainWindow(QMainWindow):
         plate, ok = QInputDialog.getText(self, "Add Plate", "Enter license plate:")
         if ok and plate:
             self.plate_list.addItem(plate)
+            self._plate_set.add(plate)
     
     def remove_plate(self):
         """Remove the selected license plate from the list."""
         current_item = self.plate_list.currentItem()
         if current_item:
+            self._plate_set.discard(current_item.text())
             self.plate_list.takeItem(self.plate_list.row(current_item))
     
     def update_frame(self, frame):
         """Update the camera feed display with a new frame."""
         pixmap = QPixmap.fromImage(frame)
-        scaled_pixmap = pixmap.scaled(self.camera_display.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.camera_display.setPixmap(scaled_pixmap)
+        target_size = self.camera_display.size()
+        if frame.size() != target_size:
+            # Nearest-neighbour is indistinguishable on a live feed and far
+            # cheaper than bilinear resampling at streaming frame rates
+            pixmap = pixmap.scaled(target_size, Qt.KeepAspectRatio, Qt.FastTransformation)
+        self.camera_display.setPixmap(pixmap)
         self.camera_display.setAlignment(QtCore.Qt.AlignCenter)
     
     def add_detection_result(self, result):
-        """Add a new detection result to the results table."""
-        row = self.results_table.rowCount()
-        self.results_table.insertRow(row)
-        # Ensure all columns are filled: Time, Vehicle Type, License Plate, Color
-        self.results_table.setItem(row, 0, QTableWidgetItem(result.get('timestamp', '')))
-        self.results_table.setItem(row, 1, QTableWidgetItem(result.get('vehicle_type', 'Unknown')))
-        self.results_table.setItem(row, 2, QTableWidgetItem(result.get('plate', '')))
-        self.results_table.setItem(row, 3, QTableWidgetItem(result.get('color', 'Unknown')))
+        """Queue a new detection result; rows are flushed to the table in batches."""
+        self._pending_results.append(result)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
         # Check if plate is in monitoring list
-        for i in range(self.plate_list.count()):
-            item = self.plate_list.item(i)
-            if item and result.get('plate', '') and item.text() == result.get('plate', ''):
-                self.status_bar.showMessage(f"Monitored vehicle detected: {result.get('plate', '')}")
-                break
+        plate = result.get('plate', '')
+        if plate and plate in self._plate_set:
+            self.status_bar.showMessage(f"Monitored vehicle detected: {plate}")
+
+    def _flush_results(self):
+        """Write all queued detection results to the table in one update pass."""
+        pending, self._pending_results = self._pending_results, []
+        if not pending:
+            return
+        table = self.results_table
+        was_sorting = table.isSortingEnabled()
+        table.setUpdatesEnabled(False)
+        table.setSortingEnabled(False)
+        try:
+            base = table.rowCount()
+            table.setRowCount(base + len(pending))
+            # Ensure all columns are filled: Time, Vehicle Type, License Plate, Color
+            for i, result in enumerate(pending):
+                table.setItem(base + i, 0, QTableWidgetItem(result.get('timestamp', '')))
+                table.setItem(base + i, 1, QTableWidgetItem(result.get('vehicle_type', 'Unknown')))
+                table.setItem(base + i, 2, QTableWidgetItem(result.get('plate', '')))
+                table.setItem(base + i, 3, QTableWidgetItem(result.get('color', 'Unknown')))
+        finally:
+            table.setSortingEnabled(was_sorting)
+            table.setUpdatesEnabled(True)
     
     def export_results(self):
         """Export detection results to a CSV file."""
         filename, _ = QFileDialog.getSaveFileName(self, "Export Results", "", "CSV Files (*.csv)")
         if filename:
             try:
-                with open(filename, 'w') as f:
-                    f.write("Timestamp,Plate,Confidence\n")
-                    for row in range(self.results_table.rowCount()):
-                        timestamp_item = self.results_table.item(row, 0)
-                        plate_item = self.results_table.item(row, 1)
-                        confidence_item = self.results_table.item(row, 2)
-                        timestamp = timestamp_item.text() if timestamp_item else ""
-                        plate = plate_item.text() if plate_item else ""
-                        confidence = confidence_item.text() if confidence_item else ""
-                        f.write(f"{timestamp},{plate},{confidence}\n")
+                table = self.results_table
+                with open(filename, 'w', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["Time", "Vehicle Type", "License Plate", "Color"])
+                    writer.writerows(
+                        [item.text() if item is not None else ""
+                         for item in (table.item(row, col) for col in range(table.columnCount()))]
+                        for row in range(table.rowCount())
+                    )
                 self.status_bar.showMessage(f"Results exported to {filename}")
             except Exception as e:
                 self.status_bar.showMessage(f"Export failed: {str(e)}")
@@ -567,12 +704,17 @@ class ANPRMainWindow(QMainWindow):
     def update_system_monitor(self):
         """Update the status bar with system resource usage."""
         try:
-            import psutil
-            cpu_percent = psutil.cpu_percent()
+            # interval=None returns the delta since the last call without blocking
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory_percent = psutil.virtual_memory().percent
-            disk_percent = psutil.disk_usage('/').percent
-            
-            status_text = f"CPU: {cpu_percent}% | Memory: {memory_percent}% | Disk: {disk_percent}% | "
+            # Disk usage barely changes; refresh the cached value once a minute
+            # instead of issuing a synchronous statvfs on every tick
+            now = time.monotonic()
+            if now - self._disk_checked > 60:
+                self._disk_percent = psutil.disk_usage('/').percent
+                self._disk_checked = now
+
+            status_text = f"CPU: {cpu_percent}% | Memory: {memory_percent}% | Disk: {self._disk_percent}% | "
             if self.is_streaming:
                 status_text += "Camera: Active | FPS: N/A"
             else:
@@ -592,14 +734,24 @@ class ANPRMainWindow(QMainWindow):
 
     def search_vehicle(self):
         """Search for vehicles in the monitoring list."""
-        search_text = self.search_input.text().lower()
-        for i in range(self.plate_list.count()):
-            item = self.plate_list.item(i)
-            if item:
-                if search_text in item.text().lower():
-                    item.setHidden(False)
-                else:
-                    item.setHidden(True)
+        search_text = self.search_input.text()
+        # findItems does the substring matching in C++ (case-insensitive by
+        # default); disabling updates coalesces the per-item setHidden
+        # repaints into a single one
+        matched = set(self.plate_list.findItems(search_text, QtCore.Qt.MatchContains))
+        self.plate_list.setUpdatesEnabled(False)
+        try:
+            for i in range(self.plate_list.count()):
+                item = self.plate_list.item(i)
+                if item:
+                    item.setHidden(item not in matched)
+        finally:
+            self.plate_list.setUpdatesEnabled(True)
+
+    def refresh_cameras(self):
+        """Force a device re-probe (Refresh button) and update the dropdown."""
+        CameraThread.invalidate_cameras()
+        self.scan_and_update_cameras()
 
     def scan_and_update_cameras(self):
         """Scan for available cameras and update the dropdown."""
@@ -631,6 +783,15 @@ class ANPRMainWindow(QMainWindow):
         self.camera_display.setAlignment(QtCore.Qt.AlignCenter)
         self.camera_display.setStyleSheet("border: 1px solid #FFFFFF; background-color: #1E1E1E;")
 
+    def closeEvent(self, event):
+        """Stop streaming and shut down the processor thread on exit."""
+        if self.anpr_processor is not None:
+            self.anpr_processor.stop_stream()
+        if hasattr(self, 'processor_thread'):
+            self.processor_thread.quit()
+            self.processor_thread.wait()
+        super().closeEvent(event)
+
 # ===== MAIN APPLICATION ENTRY POINT =====
 def main():
     """Main application entry point: sets up the app and launches the main window."""
@@ -658,13 +819,19 @@ def setup_logging():
     """Setup logging for the application."""
     logger = logging.getLogger('ANPR')
     logger.setLevel(logging.INFO)
-    handler = RotatingFileHandler('anpr.log', maxBytes=1024*1024, backupCount=5)
+    # File writes (and rotation) happen on a background listener thread, so
+    # a logger call from the frame pipeline is just a queue put
+    log_queue = queue.Queue(-1)
+    file_handler = RotatingFileHandler('anpr.log', maxBytes=1024*1024, backupCount=5)
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    return logger
-
-logger = setup_logging()
+    file_handler.setFormatter(formatter)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    return logger, listener
+
+logger, _log_listener = setup_logging()
+atexit.register(_log_listener.stop)
 
 # ===== EXPORT TO PDF FUNCTION =====
 def export_to_pdf(self):
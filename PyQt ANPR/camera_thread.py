@@ -1,18 +1,79 @@
 import cv2
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
 import numpy as np
 
+# Shared application logger (configured by the GUI's setup_logging)
+logger = logging.getLogger('ANPR')
+
+# Default capture format requested from cameras
+DEFAULT_WIDTH = 1280
+DEFAULT_HEIGHT = 720
+DEFAULT_FPS = 30
+
+# Explicit capture backend per platform; letting OpenCV auto-probe every
+# backend is the slow part of opening a device
+if sys.platform.startswith('linux'):
+    CAPTURE_BACKEND = cv2.CAP_V4L2
+elif os.name == 'nt':
+    CAPTURE_BACKEND = cv2.CAP_DSHOW
+elif sys.platform == 'darwin':
+    CAPTURE_BACKEND = cv2.CAP_AVFOUNDATION
+else:
+    CAPTURE_BACKEND = cv2.CAP_ANY
+
+def _probe_camera(index, skip_grab=False):
+    # Check whether a camera exists at the given index. isOpened() alone can
+    # report success for disconnected devices (notably on DirectShow), so
+    # require a grab() too; a single-frame buffer keeps that grab fast.
+    # skip_grab is used for a device that is already streaming, where a
+    # second handle's grab fails (EBUSY on V4L2) despite the camera working.
+    cap = cv2.VideoCapture(index, CAPTURE_BACKEND)
+    ok = cap.isOpened()
+    if ok and not skip_grab:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        ok = cap.grab()
+    cap.release()
+    return index if ok else None
+
+# Qt 5.14+ accepts OpenCV's native BGR layout directly, so no per-frame
+# channel reorder is needed; older Qt versions fall back to rgbSwapped(),
+# which does the swap in optimized C++ rather than Python/NumPy
+_HAS_BGR888 = hasattr(QImage, 'Format_BGR888')
+
+def bgr_to_qimage(frame):
+    # Convert an OpenCV BGR frame to a QImage without a Python-side copy.
+    # Pass strides[0] as bytesPerLine so non-contiguous rows stay correct.
+    h, w = frame.shape[:2]
+    if _HAS_BGR888:
+        # .copy() detaches from the numpy buffer, which the capture loop
+        # overwrites on the next frame
+        return QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888).copy()
+    # rgbSwapped() already returns a detached copy
+    return QImage(frame.data, w, h, frame.strides[0], QImage.Format_RGB888).rgbSwapped()
+
 # CameraThread is a QThread subclass for handling camera capture in a separate thread
 class CameraThread(QThread):
-    # Signal emitted when a new frame is ready (as a QImage)
-    frame_ready = pyqtSignal(QImage)
     # Signal emitted when a new frame is ready (as a numpy array)
     frame_ready_raw = pyqtSignal(object)
+    # Cached probe result shared across instances; probing costs hundreds of
+    # ms per index, so it is invalidated explicitly rather than re-run per call
+    _available_cameras_cache = None
+    # Device index currently streaming (None when idle); the probe must not
+    # grab() from it, or a Refresh during streaming would drop it from the list
+    _active_source = None
     # Signal emitted when an error occurs (with error message)
     error_occurred = pyqtSignal(str)
+    # Signal emitted periodically with capture stats (fps, latency s, drops)
+    stats_ready = pyqtSignal(float, float, int)
 
-    def __init__(self):
+    def __init__(self, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, fps=DEFAULT_FPS):
         super().__init__()
         # Flag to control the running state of the thread
         self.running = False
@@ -20,25 +81,60 @@ class CameraThread(QThread):
         self.cap = None
         # Camera source index (default 0)
         self.source = 0
+        # Requested capture format
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # Smoothed capture metrics (EWMA); cost per frame is a few float ops
+        self.fps_ewma = 0.0
+        self.latency_ewma = 0.0
+        self.dropped_frames = 0
+        # Set by the consumer when it is ready for another frame; frames
+        # grabbed while the consumer is busy are dropped, not queued
+        self._consumer_ready = threading.Event()
+        self._consumer_ready.set()
 
     def set_source(self, source):
         # Set the camera source (index or video file path)
         self.source = source
 
+    def notify_consumer_ready(self):
+        # Called by the frame consumer once it can accept another frame
+        self._consumer_ready.set()
+
     def start_streaming(self):
         # Start the camera stream in a new thread
         if self.cap is not None:
             self.cap.release()
-        self.cap = cv2.VideoCapture(self.source)
+        # For RTSP sources, tell the FFmpeg demuxer not to buffer frames itself
+        if isinstance(self.source, str) and self.source.startswith("rtsp://"):
+            os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;udp|fflags;nobuffer|flags;low_delay'
+        if isinstance(self.source, int):
+            # Go straight to the platform device backend (V4L2 on Linux);
+            # this skips OpenCV's backend auto-probe and its extra buffering
+            self.cap = cv2.VideoCapture(self.source, CAPTURE_BACKEND)
+        else:
+            # URL/file sources stay on auto-detect so FFmpeg handles them
+            self.cap = cv2.VideoCapture(self.source)
         if not self.cap.isOpened():
             # Emit error if camera cannot be opened
             self.error_occurred.emit(f"Failed to open camera source: {self.source}")
             return False
+        # Keep only the latest frame in the capture buffer to minimise latency
+        if not self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1):
+            logger.warning("Backend ignored CAP_PROP_BUFFERSIZE=1; frames may lag.")
+        # Request MJPG before resolution: UVC webcams default to uncompressed
+        # YUY2, whose USB bandwidth caps the frame rate at higher resolutions
+        if isinstance(self.source, int):
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         # Set camera properties: resolution and FPS
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
         self.running = True
+        self._consumer_ready.set()
+        if isinstance(self.source, int):
+            CameraThread._active_source = self.source
         self.start()  # Start the thread (calls run())
         return True
 
@@ -46,38 +142,70 @@ class CameraThread(QThread):
         # Stop the camera stream and release resources
         self.running = False
         self.wait()  # Wait for the thread to finish
+        CameraThread._active_source = None
         if self.cap is not None:
             self.cap.release()
             self.cap = None
 
     def run(self):
         # Main loop for capturing frames from the camera
-        while self.running and self.cap is not None:
-            ret, frame = self.cap.read()
-            if not ret:
+        if self.cap is None:
+            return
+        # Hoist hot-loop lookups into locals so the Python between the
+        # C-level OpenCV calls is a handful of bytecodes per frame
+        cap = self.cap
+        consumer_ready = self._consumer_ready
+        emit_frame = self.frame_ready_raw.emit
+        emit_stats = self.stats_ready.emit
+        perf_counter = time.perf_counter
+        emitted = 0
+        last_grab = perf_counter()
+        while self.running:
+            # grab() dequeues without decoding; only decode when the
+            # consumer can keep up, so the display never lags reality
+            if not cap.grab():
                 # Emit error if frame cannot be read
                 self.error_occurred.emit("Failed to read frame from camera.")
                 break
+            now = perf_counter()
+            interval = now - last_grab
+            last_grab = now
+            if interval > 0:
+                self.fps_ewma = 0.9 * self.fps_ewma + 0.1 / interval
+            if not consumer_ready.is_set():
+                self.dropped_frames += 1
+                continue
+            consumer_ready.clear()
+            ret, frame = cap.retrieve()
+            if not ret:
+                self.error_occurred.emit("Failed to read frame from camera.")
+                break
             # Emit the raw frame for processing
-            self.frame_ready_raw.emit(frame)
-            # For backward compatibility, also emit QImage
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_frame.shape
-            bytes_per_line = ch * w
-            # Use .tobytes() to get the image buffer as bytes
-            qt_image = QImage(rgb_frame.data.tobytes(), w, h, bytes_per_line, QImage.Format_RGB888)
-            self.frame_ready.emit(qt_image)
+            emit_frame(frame)
+            self.latency_ewma = 0.9 * self.latency_ewma + 0.1 * (perf_counter() - now)
+            emitted += 1
+            # Publish smoothed stats roughly once a second at 30 fps
+            if emitted % 30 == 0:
+                emit_stats(self.fps_ewma, self.latency_ewma, self.dropped_frames)
         # Release the camera when done
         if self.cap is not None:
             self.cap.release()
             self.cap = None
 
     def get_available_cameras(self):
-        # Scan and return a list of available camera indices (0-9)
-        available_cameras = []
-        for i in range(10):
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                available_cameras.append(i)
-                cap.release()
-        return available_cameras 
\ No newline at end of file
+        # Return the cached scan if one exists; call invalidate_cameras()
+        # first to force a re-probe (e.g. after plugging in a camera)
+        if CameraThread._available_cameras_cache is None:
+            # Scan camera indices 0-9 concurrently; each open can block for
+            # hundreds of ms, so probing them serially stalls the GUI for seconds
+            active = CameraThread._active_source
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = executor.map(
+                    lambda i: _probe_camera(i, skip_grab=(i == active)), range(10))
+            CameraThread._available_cameras_cache = [i for i in results if i is not None]
+        return CameraThread._available_cameras_cache
+
+    @classmethod
+    def invalidate_cameras(cls):
+        # Drop the cached scan so the next get_available_cameras re-probes
+        cls._available_cameras_cache = None 
\ No newline at end of file